@@ -14,22 +14,26 @@ What things you need to install the software and how to install them
 - PyYaml
 """
 
-import pandas as pd
 import yaml
 import os
-import sys
+import hashlib
 import logging
-import argparse
-import time
-import datetime
-import re
+import tempfile
 
-from atlassian import Bamboo as bamboo
+from concurrent.futures import ThreadPoolExecutor
+
+Dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+CATEGORY_COLUMNS = ('user', 'group', 'permission', 'type')
 
 class BambooAccess:
     """
     Class to collect user and group access information for Atlassian Bamboo Global permissions, Build plan permissions, Project permissions, Deployment permissions, Deployment project permissions, Deployment environment permissions.
     """
+    __slots__ = ('bamboo_url', 'bamboo_user', 'bamboo_password', 'bamboo_log_file', 'bamboo_log_level', 'bamboo_client')
+
+    _KINDS = ('global', 'build_plan', 'project', 'deployment', 'deployment_project', 'deployment_environment')
+
     def __init__(self, bamboo_url, bamboo_user, bamboo_password, bamboo_log_file, bamboo_log_level):
         """
         Initialize the class with the Bamboo URL, user, password, log file and log level.
@@ -44,108 +48,158 @@ class BambooAccess:
         self.bamboo_password = bamboo_password
         self.bamboo_log_file = bamboo_log_file
         self.bamboo_log_level = bamboo_log_level
-        self.bamboo_client = bamboo.Bamboo(self.bamboo_url, self.bamboo_user, self.bamboo_password)
+        from atlassian import Bamboo
+        self.bamboo_client = Bamboo(self.bamboo_url, self.bamboo_user, self.bamboo_password)
         self.bamboo_client.logger.setLevel(self.bamboo_log_level)
-        self.bamboo_client.logger.addHandler(logging.FileHandler(self.bamboo_log_file))
+        log_file = os.path.abspath(self.bamboo_log_file)
+        if not any(isinstance(handler, logging.FileHandler) and handler.baseFilename == log_file for handler in self.bamboo_client.logger.handlers):
+            self.bamboo_client.logger.addHandler(logging.FileHandler(log_file))
         self.bamboo_client.logger.info("Bamboo client initialized")
 
-    def get_global_permissions(self):
-        """
-        Get the global permissions for all users and groups.
-        :return: Global permissions for all users and groups
-        """
-        global_permissions = self.bamboo_client.get_global_permissions()
-        return global_permissions
-
-    def get_build_plan_permissions(self):
-        """
-        Get the build plan permissions for all users and groups.
-        :return: Build plan permissions for all users and groups
-        """
-        build_plan_permissions = self.bamboo_client.get_build_plan_permissions()
-        return build_plan_permissions
+    @classmethod
+    def from_client(cls, bamboo_client):
+        """
+        Create an instance around an existing Bamboo client, leaving the client's logging untouched.
+        :param bamboo_client: Bamboo client
+        :return: BambooAccess using the given client
+        """
+        bamboo_access = cls.__new__(cls)
+        bamboo_access.bamboo_url = None
+        bamboo_access.bamboo_user = None
+        bamboo_access.bamboo_password = None
+        bamboo_access.bamboo_log_file = None
+        bamboo_access.bamboo_log_level = None
+        bamboo_access.bamboo_client = bamboo_client
+        return bamboo_access
 
-    def get_project_permissions(self):
+    def get(self, kind):
         """
-        Get the project permissions for all users and groups.
-        :return: Project permissions for all users and groups
+        Get the permissions of a kind for all users and groups.
+        :param kind: Permission kind, one of _KINDS
+        :return: Permissions of the kind for all users and groups
         """
-        project_permissions = self.bamboo_client.get_project_permissions()
-        return project_permissions
+        return getattr(self.bamboo_client, 'get_{}_permissions'.format(kind))()
 
-    def get_deployment_permissions(self):
-        """
-        Get the deployment permissions for all users and groups.
-        :return: Deployment permissions for all users and groups
-        """
-        deployment_permissions = self.bamboo_client.get_deployment_permissions()
-        return deployment_permissions
-
-    def get_deployment_project_permissions(self):
-        """
-        Get the deployment project permissions for all users and groups.
-        :return: Deployment project permissions for all users and groups
-        """
-        deployment_project_permissions = self.bamboo_client.get_deployment_project_permissions()
-        return deployment_project_permissions
-
-    def get_deployment_environment_permissions(self):
+    def get_all_permissions(self):
         """
-        Get the deployment environment permissions for all users and groups.
-        :return: Deployment environment permissions for all users and groups
+        Get all permissions for all users and groups.
+        :return: All permissions for all users and groups, in the order of _KINDS
         """
-        deployment_environment_permissions = self.bamboo_client.get_deployment_environment_permissions()
-        return deployment_environment_permissions
+        with ThreadPoolExecutor(max_workers=len(self._KINDS)) as executor:
+            return tuple(executor.map(self.get, self._KINDS))
 
-    def get_all_permissions(self):
+    def iter_all_permissions(self, columns):
         """
-        Get all permissions for all users and groups.
-        :return: All permissions for all users and groups
+        Iterate over all permissions for all users and groups as tuples, fetching the kinds concurrently.
+        :param columns: Columns of the tuples for each kind, in the order of _KINDS
+        :return: Permissions of each kind as a list of tuples of its columns, in the order of _KINDS
         """
-        global_permissions = self.get_global_permissions()
-        build_plan_permissions = self.get_build_plan_permissions()
-        project_permissions = self.get_project_permissions()
-        deployment_permissions = self.get_deployment_permissions()
-        deployment_project_permissions = self.get_deployment_project_permissions()
-        deployment_environment_permissions = self.get_deployment_environment_permissions()
-        return global_permissions, build_plan_permissions, project_permissions, deployment_permissions, deployment_project_permissions, deployment_environment_permissions
+        for permissions, kind_columns in zip(self.get_all_permissions(), columns):
+            yield [tuple(permission.get(column) for column in kind_columns) for permission in permissions]
 
     def get_all_permissions_df(self):
         """
         Get all permissions for all users and groups in a dataframe.
         :return: All permissions for all users and groups in a dataframe
         """
-        global_permissions, build_plan_permissions, project_permissions, deployment_permissions, deployment_project_permissions, deployment_environment_permissions = self.get_all_permissions()
-        global_permissions_df = pd.DataFrame(global_permissions)
-        build_plan_permissions_df = pd.DataFrame(build_plan_permissions)
-        project_permissions_df = pd.DataFrame(project_permissions)
-        deployment_permissions_df = pd.DataFrame(deployment_permissions)
-        deployment_project_permissions_df = pd.DataFrame(deployment_project_permissions)
-        deployment_environment_permissions_df = pd.DataFrame(deployment_environment_permissions)
-        return global_permissions_df, build_plan_permissions_df, project_permissions_df, deployment_permissions_df, deployment_project_permissions_df, deployment_environment_permissions_df
+        return tuple(map(self._records_to_df, self.get_all_permissions()))
+
+    def _records_to_df(self, records):
+        """
+        Build a dataframe from permission records.
+        :param records: Permissions as a list of records
+        :return: Permissions in a dataframe, low-cardinality string columns as categories
+        """
+        import pandas as pd
+        df = pd.DataFrame(self._as_records(records))
+        for column in CATEGORY_COLUMNS:
+            if column in df:
+                df[column] = df[column].astype('category')
+        return df
 
     def get_all_permissions_df_yaml(self):
         """
         Get all permissions for all users and groups in a dataframe and write to a YAML file.
         :return: All permissions for all users and groups in a dataframe and write to a YAML file
         """
-        global_permissions_df, build_plan_permissions_df, project_permissions_df, deployment_permissions_df, deployment_project_permissions_df, deployment_environment_permissions_df = self.get_all_permissions_df()
-        global_permissions_df_yaml = global_permissions_df.to_dict(orient='records')
-        build_plan_permissions_df_yaml = build_plan_permissions_df.to_dict(orient='records')
-        project_permissions_df_yaml = project_permissions_df.to_dict(orient='records')
-        deployment_permissions_df_yaml = deployment_permissions_df.to_dict(orient='records')
-        deployment_project_permissions_df_yaml = deployment_project_permissions_df.to_dict(orient='records')
-        deployment_environment_permissions_df_yaml = deployment_environment_permissions_df.to_dict(orient='records')
-        return global_permissions_df_yaml, build_plan_permissions_df_yaml, project_permissions_df_yaml, deployment_permissions_df_yaml, deployment_project_permissions_df_yaml, deployment_environment_permissions_df_yaml
+        return tuple(self._as_records(permissions) for permissions in self.get_all_permissions())
+
+    def _as_records(self, permissions):
+        """
+        Get permissions as a list of records.
+        :param permissions: Permissions as returned by the Bamboo client
+        :return: Permissions as a list of records
+        """
+        return permissions if isinstance(permissions, list) else list(permissions)
 
     def write_all_permissions_df_yaml(self, output_file):
         """
         Write all permissions for all users and groups in a dataframe to a YAML file.
+        The YAML is not rendered when the permissions match the data digest stored in <output_file>.sha1 and the file still matches the file digest stored next to it.
         :param output_file: Output file
         :return: All permissions for all users and groups in a dataframe and write to a YAML file
         """
-        global_permissions_df_yaml, build_plan_permissions_df_yaml, project_permissions_df_yaml, deployment_permissions_df_yaml, deployment_project_permissions_df_yaml, deployment_environment_permissions_df_yaml = self.get_all_permissions_df_yaml()
-        with open(output_file, 'w') as outfile:
-            yaml.dump({'global_permissions': global_permissions_df_yaml, 'build_plan_permissions': build_plan_permissions_df_yaml, 'project_permissions': project_permissions_df_yaml, 'deployment_permissions': deployment_permissions_df_yaml, 'deployment_project_permissions': deployment_project_permissions_df_yaml, 'deployment_environment_permissions': deployment_environment_permissions_df_yaml}, outfile, default_flow_style=False)
-        return global_permissions_df_yaml, build_plan_permissions_df_yaml, project_permissions_df_yaml, deployment_permissions_df_yaml, deployment_project_permissions_df_yaml, deployment_environment_permissions_df_yaml
-    
\ No newline at end of file
+        permissions_df_yaml = {kind + '_permissions': self._as_records(permissions) for kind, permissions in zip(self._KINDS, self.get_all_permissions())}
+        digest = hashlib.sha1(repr(sorted(permissions_df_yaml.items())).encode()).hexdigest()
+        digest_file = output_file + '.sha1'
+        if os.path.exists(output_file) and os.path.exists(digest_file):
+            with open(digest_file) as infile:
+                if infile.read().split() == [digest, _file_sha1(output_file)]:
+                    return tuple(permissions_df_yaml.values())
+        content = ''.join(yaml.dump({section: permissions_df_yaml[section]}, Dumper=Dumper, default_flow_style=False) for section in sorted(permissions_df_yaml)).encode()
+        _replace_file(output_file, content)
+        _replace_file(digest_file, '{}\n{}\n'.format(digest, hashlib.sha1(content).hexdigest()).encode())
+        return tuple(permissions_df_yaml.values())
+
+
+def _file_sha1(path):
+    """
+    Get the SHA1 digest of a file's content.
+    :param path: Path of the file
+    :return: Hex digest of the file's content
+    """
+    with open(path, 'rb') as infile:
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(infile, 'sha1').hexdigest()
+        return hashlib.sha1(infile.read()).hexdigest()
+
+
+def _replace_file(path, content):
+    """
+    Atomically replace a file's content through a uniquely named temporary file in the same directory.
+    :param path: Path of the file
+    :param content: New content as bytes
+    """
+    mode = os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644
+    outfile = tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(path)), prefix=os.path.basename(path) + '.', suffix='.tmp', delete=False)
+    try:
+        with outfile:
+            outfile.write(content)
+        os.chmod(outfile.name, mode)
+        os.replace(outfile.name, path)
+    except BaseException:
+        os.unlink(outfile.name)
+        raise
+
+
+def _permissions_getter(kind):
+    """
+    Build a method that gets the permissions of a kind for all users and groups.
+    :param kind: Permission kind, one of BambooAccess._KINDS
+    :return: Method calling the matching Bamboo client method
+    """
+    name = 'get_{}_permissions'.format(kind)
+
+    def getter(self):
+        return getattr(self.bamboo_client, name)()
+    getter.__name__ = name
+    getter.__qualname__ = 'BambooAccess.' + name
+    getter.__doc__ = """
+        Get the {} permissions for all users and groups.
+        :return: {} permissions for all users and groups
+        """.format(kind.replace('_', ' '), kind.replace('_', ' ').capitalize())
+    return getter
+
+
+for _kind in BambooAccess._KINDS:
+    setattr(BambooAccess, 'get_{}_permissions'.format(_kind), _permissions_getter(_kind))
@@ -1,16 +1,139 @@
-import pandas as pd
 import yaml
 import os
+import copy
 import sys
-import logging
 import argparse
 import time
 import datetime
 import re
 
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
+
+from requests.adapters import HTTPAdapter
+
 from bamboo_access import BambooAccess
 
-from atlassian import Bamboo as bamboo
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+Dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+GLOBAL_KEYS = ['permission', 'type', 'name']
+BUILD_PLAN_KEYS = GLOBAL_KEYS + ['projectKey', 'planKey']
+PROJECT_KEYS = GLOBAL_KEYS + ['projectKey']
+DEPLOYMENT_KEYS = GLOBAL_KEYS
+DEPLOYMENT_PROJECT_KEYS = GLOBAL_KEYS + ['projectKey']
+DEPLOYMENT_ENVIRONMENT_KEYS = GLOBAL_KEYS + ['projectKey', 'environmentId']
+
+BATCH_TYPES = {'user': 'users', 'group': 'groups'}
+
+Categories = namedtuple('Categories', 'global_ build_plan project deployment deployment_project deployment_environment')
+
+PERMISSION_CATEGORIES = Categories('global', 'build_plan', 'project', 'deployment', 'deployment_project', 'deployment_environment')
+PERMISSION_SECTIONS = Categories._make(category + '_permissions' for category in PERMISSION_CATEGORIES)
+PERMISSION_KEYS = Categories(GLOBAL_KEYS, BUILD_PLAN_KEYS, PROJECT_KEYS, DEPLOYMENT_KEYS, DEPLOYMENT_PROJECT_KEYS, DEPLOYMENT_ENVIRONMENT_KEYS)
+BATCH_HANDLERS = Categories(
+    global_=('_grant_global_permissions', '_revoke_global_permissions'),
+    build_plan=None,
+    project=None,
+    deployment=None,
+    deployment_project=('_grant_deployment_project_permissions', '_revoke_deployment_project_permissions'),
+    deployment_environment=('_grant_deployment_environment_permissions', '_revoke_deployment_environment_permissions'),
+)
+
+
+def _iter_cols(records, cols):
+    """
+    Iterate over the given columns of the records as tuples.
+    :param records: Permission records
+    :param cols: Columns to extract, in argument order
+    :return: Iterator of column value tuples
+    """
+    return map(itemgetter(*cols), records)
+
+
+def _row_diff(cur_rows, des_records, keys):
+    """
+    Get the desired records that are not in the current rows and the current rows that are not in the desired records.
+    :param cur_rows: Current permissions as tuples of the key columns of this category
+    :param des_records: Desired permission records
+    :param keys: Columns identifying a permission in this category
+    :return: Records to be added and records to be removed
+    """
+    des_rows = list(_iter_cols(des_records, keys))
+    cur = set(cur_rows)
+    des = set(des_rows)
+    if cur == des:
+        return [], []
+    added = [dict(zip(keys, row)) for row in dict.fromkeys(des_rows) if row not in cur]
+    removed = [dict(zip(keys, row)) for row in dict.fromkeys(cur_rows) if row not in des]
+    return added, removed
+
+
+def _validate_records(records, section, keys):
+    """
+    Check that every desired permission record has the key columns of its section.
+    :param records: Desired permission records
+    :param section: Section of the desired permissions file the records come from
+    :param keys: Columns identifying a permission in this category
+    :return: The records, unchanged
+    :raises ValueError: If a record is not a mapping or misses a key column
+    """
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            raise ValueError("{} record {} is not a mapping: {!r}".format(section, index, record))
+        for key in keys:
+            if key not in record:
+                raise ValueError("{} record {} is missing the '{}' key: {!r}".format(section, index, key, record))
+    return records
+
+
+def _group_permissions(records, keys):
+    """
+    Group the permission names of records that share all their other key columns.
+    :param records: Permission records
+    :param keys: Columns identifying a permission in this category, starting with 'permission'
+    :return: Permission names keyed by the tuple of the other key columns
+    """
+    groups = {}
+    for row in _iter_cols(records, keys):
+        groups.setdefault(row[1:], []).append(row[0])
+    return groups
+
+
+def _to_records_dict(permissions_records, suffix):
+    """
+    Key the records of each permission category by their section name.
+    :param permissions_records: Records for each permission category, in PERMISSION_SECTIONS order
+    :param suffix: Suffix appended to each section name
+    :return: Records keyed by section name
+    """
+    return {section + suffix: records for section, records in zip(PERMISSION_SECTIONS, permissions_records)}
+
+
+@lru_cache(maxsize=32)
+def _load_yaml_cached(path, mtime):
+    """
+    Load a YAML file, caching the result until the file's modification time changes.
+    The returned object is shared between calls and must not be modified.
+    :param path: Path of the YAML file
+    :param mtime: Modification time of the YAML file, part of the cache key
+    :return: Loaded YAML data
+    """
+    with open(path, 'rb') as stream:
+        return yaml.load(stream, Loader=Loader)
+
+
+def _dump_yaml(data, output_file):
+    """
+    Write data to a YAML file, keeping the key order of the data.
+    :param data: Data to write
+    :param output_file: Output file
+    """
+    with open(output_file, 'w') as outfile:
+        yaml.dump(data, outfile, Dumper=Dumper, default_flow_style=False, sort_keys=False)
+
 
 class BambooAccessReconciler:
     """
@@ -21,6 +144,8 @@ class BambooAccessReconciler:
     3. Compare the current permissions with the desired permissions.
     4. If there are any differences, then update the permissions in Bamboo.
     """
+    __slots__ = ('bamboo_url', 'bamboo_user', 'bamboo_password', 'bamboo_log_file', 'bamboo_log_level', 'desired_permissions_file', '_bamboo_access', 'bamboo_client', '_current_df', '_desired_df', '_diff_df')
+
     def __init__(self, bamboo_url, bamboo_user, bamboo_password, bamboo_log_file, bamboo_log_level, desired_permissions_file):
         """
         Initialize the class with the Bamboo URL, user, password, log file, log level and desired permissions file.
@@ -37,100 +162,93 @@ class BambooAccessReconciler:
         self.bamboo_log_file = bamboo_log_file
         self.bamboo_log_level = bamboo_log_level
         self.desired_permissions_file = desired_permissions_file
-        self.bamboo_client = bamboo.Bamboo(self.bamboo_url, self.bamboo_user, self.bamboo_password)
-        self.bamboo_client.logger.setLevel(self.bamboo_log_level)
-        self.bamboo_client.logger.addHandler(logging.FileHandler(self.bamboo_log_file))
-        self.bamboo_client.logger.info("Bamboo client initialized")
+        self._bamboo_access = BambooAccess(self.bamboo_url, self.bamboo_user, self.bamboo_password, self.bamboo_log_file, self.bamboo_log_level)
+        self.bamboo_client = self._bamboo_access.bamboo_client
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+        self.bamboo_client._session.mount('http://', adapter)
+        self.bamboo_client._session.mount('https://', adapter)
+        self._current_df = None
+        self._desired_df = None
+        self._diff_df = None
 
-    def get_current_permissions(self):
+    @classmethod
+    def from_client(cls, bamboo_client, desired_permissions_file=None):
         """
-        Get the current permissions for all users and groups.
-        :return: Current permissions for all users and groups
+        Create a reconciler around an existing Bamboo client, leaving the client's logging and HTTP session untouched.
+        :param bamboo_client: Bamboo client
+        :param desired_permissions_file: Desired permissions file
+        :return: BambooAccessReconciler using the given client
         """
-        current_permissions = BambooAccess(self.bamboo_url, self.bamboo_user, self.bamboo_password, self.bamboo_log_file, self.bamboo_log_level)
-        current_permissions_df_yaml = current_permissions.write_all_permissions_df_yaml('current_permissions.yaml')
-        return current_permissions_df_yaml
+        bamboo_access_reconciler = cls.__new__(cls)
+        bamboo_access_reconciler.bamboo_url = None
+        bamboo_access_reconciler.bamboo_user = None
+        bamboo_access_reconciler.bamboo_password = None
+        bamboo_access_reconciler.bamboo_log_file = None
+        bamboo_access_reconciler.bamboo_log_level = None
+        bamboo_access_reconciler.desired_permissions_file = desired_permissions_file
+        bamboo_access_reconciler._bamboo_access = BambooAccess.from_client(bamboo_client)
+        bamboo_access_reconciler.bamboo_client = bamboo_client
+        bamboo_access_reconciler._current_df = None
+        bamboo_access_reconciler._desired_df = None
+        bamboo_access_reconciler._diff_df = None
+        return bamboo_access_reconciler
 
     def get_desired_permissions(self):
         """
         Get the desired permissions for all users and groups.
-        :return: Desired permissions for all users and groups
+        :return: Desired permissions for all users and groups, a copy the caller may modify
+        :raises yaml.YAMLError: If the desired permissions file is not valid YAML
         """
-        with open(self.desired_permissions_file, 'r') as stream:
-            try:
-                desired_permissions_df_yaml = yaml.safe_load(stream)
-            except yaml.YAMLError as exc:
-                print(exc)
-        return desired_permissions_df_yaml
+        return copy.deepcopy(_load_yaml_cached(self.desired_permissions_file, os.path.getmtime(self.desired_permissions_file)))
 
     def get_current_permissions_df(self):
         """
-        Get the current permissions for all users and groups in a dataframe.
-        :return: Current permissions for all users and groups in a dataframe
-        """
-        current_permissions_df_yaml = self.get_current_permissions()
-        global_permissions_df_yaml = current_permissions_df_yaml[0]
-        build_plan_permissions_df_yaml = current_permissions_df_yaml[1]
-        project_permissions_df_yaml = current_permissions_df_yaml[2]
-        deployment_permissions_df_yaml = current_permissions_df_yaml[3]
-        deployment_project_permissions_df_yaml = current_permissions_df_yaml[4]
-        deployment_environment_permissions_df_yaml = current_permissions_df_yaml[5]
-        global_permissions_df = pd.DataFrame(global_permissions_df_yaml)
-        build_plan_permissions_df = pd.DataFrame(build_plan_permissions_df_yaml)
-        project_permissions_df = pd.DataFrame(project_permissions_df_yaml)
-        deployment_permissions_df = pd.DataFrame(deployment_permissions_df_yaml)
-        deployment_project_permissions_df = pd.DataFrame(deployment_project_permissions_df_yaml)
-        deployment_environment_permissions_df = pd.DataFrame(deployment_environment_permissions_df_yaml)
-        return global_permissions_df, build_plan_permissions_df, project_permissions_df, deployment_permissions_df, deployment_project_permissions_df, deployment_environment_permissions_df
+        Get the current permissions for all users and groups as tuples of the key columns of each category.
+        :return: Current permissions for all users and groups as tuples of the key columns of each category
+        """
+        if self._current_df is None:
+            self._current_df = self._get_current_permissions_df()
+        return self._current_df
+
+    def _get_current_permissions_df(self):
+        """
+        Fetch the current permissions of all categories from Bamboo concurrently.
+        """
+        return Categories._make(self._bamboo_access.iter_all_permissions(PERMISSION_KEYS))
 
     def get_desired_permissions_df(self):
         """
-        Get the desired permissions for all users and groups in a dataframe.
-        :return: Desired permissions for all users and groups in a dataframe
+        Get the desired permissions for all users and groups as records.
+        :return: Desired permissions for all users and groups as records
+        """
+        if self._desired_df is None:
+            self._desired_df = self._get_desired_permissions_df()
+        return self._desired_df
+
+    def _get_desired_permissions_df(self):
+        """
+        Get the desired permission records of each category from the desired permissions file.
         """
         desired_permissions_df_yaml = self.get_desired_permissions()
-        global_permissions_df_yaml = desired_permissions_df_yaml['global_permissions']
-        build_plan_permissions_df_yaml = desired_permissions_df_yaml['build_plan_permissions']
-        project_permissions_df_yaml = desired_permissions_df_yaml['project_permissions']
-        deployment_permissions_df_yaml = desired_permissions_df_yaml['deployment_permissions']
-        deployment_project_permissions_df_yaml = desired_permissions_df_yaml['deployment_project_permissions']
-        deployment_environment_permissions_df_yaml = desired_permissions_df_yaml['deployment_environment_permissions']
-        global_permissions_df = pd.DataFrame(global_permissions_df_yaml)
-        build_plan_permissions_df = pd.DataFrame(build_plan_permissions_df_yaml)
-        project_permissions_df = pd.DataFrame(project_permissions_df_yaml)
-        deployment_permissions_df = pd.DataFrame(deployment_permissions_df_yaml)
-        deployment_project_permissions_df = pd.DataFrame(deployment_project_permissions_df_yaml)
-        deployment_environment_permissions_df = pd.DataFrame(deployment_environment_permissions_df_yaml)
-        return global_permissions_df, build_plan_permissions_df, project_permissions_df, deployment_permissions_df, deployment_project_permissions_df, deployment_environment_permissions_df
+        return Categories._make(_validate_records(desired_permissions_df_yaml[section] or [], section, keys) for section, keys in zip(PERMISSION_SECTIONS, PERMISSION_KEYS))
 
     def get_permissions_diff(self):
         """
         Get the difference between the current permissions and the desired permissions.
-        :return: Difference between the current permissions and the desired permissions
+        :return: Records to be added and records to be removed for each permission category
         """
         current_permissions_df = self.get_current_permissions_df()
         desired_permissions_df = self.get_desired_permissions_df()
-        global_permissions_diff = current_permissions_df[0].merge(desired_permissions_df[0], indicator=True, how='outer')
-        build_plan_permissions_diff = current_permissions_df[1].merge(desired_permissions_df[1], indicator=True, how='outer')
-        project_permissions_diff = current_permissions_df[2].merge(desired_permissions_df[2], indicator=True, how='outer')
-        deployment_permissions_diff = current_permissions_df[3].merge(desired_permissions_df[3], indicator=True, how='outer')
-        deployment_project_permissions_diff = current_permissions_df[4].merge(desired_permissions_df[4], indicator=True, how='outer')
-        deployment_environment_permissions_diff = current_permissions_df[5].merge(desired_permissions_df[5], indicator=True, how='outer')
-        return global_permissions_diff, build_plan_permissions_diff, project_permissions_diff, deployment_permissions_diff, deployment_project_permissions_diff, deployment_environment_permissions_diff
+        return Categories._make(map(_row_diff, current_permissions_df, desired_permissions_df, PERMISSION_KEYS))
 
     def get_permissions_diff_df(self):
         """
         Get the difference between the current permissions and the desired permissions in a dataframe.
         :return: Difference between the current permissions and the desired permissions in a dataframe
         """
-        permissions_diff = self.get_permissions_diff()
-        global_permissions_diff = permissions_diff[0]
-        build_plan_permissions_diff = permissions_diff[1]
-        project_permissions_diff = permissions_diff[2]
-        deployment_permissions_diff = permissions_diff[3]
-        deployment_project_permissions_diff = permissions_diff[4]
-        deployment_environment_permissions_diff = permissions_diff[5]
-        return global_permissions_diff, build_plan_permissions_diff, project_permissions_diff, deployment_permissions_diff, deployment_project_permissions_diff, deployment_environment_permissions_diff
+        if self._diff_df is None:
+            self._diff_df = self.get_permissions_diff()
+        return self._diff_df
 
     def get_permissions_diff_df_yaml(self):
         """
@@ -138,19 +256,7 @@ class BambooAccessReconciler:
         :return: Difference between the current permissions and the desired permissions in a dataframe and write to a YAML file
         """
         permissions_diff_df = self.get_permissions_diff_df()
-        global_permissions_diff_df = permissions_diff_df[0]
-        build_plan_permissions_diff_df = permissions_diff_df[1]
-        project_permissions_diff_df = permissions_diff_df[2]
-        deployment_permissions_diff_df = permissions_diff_df[3]
-        deployment_project_permissions_diff_df = permissions_diff_df[4]
-        deployment_environment_permissions_diff_df = permissions_diff_df[5]
-        global_permissions_diff_df_yaml = global_permissions_diff_df.to_dict(orient='records')
-        build_plan_permissions_diff_df_yaml = build_plan_permissions_diff_df.to_dict(orient='records')
-        project_permissions_diff_df_yaml = project_permissions_diff_df.to_dict(orient='records')
-        deployment_permissions_diff_df_yaml = deployment_permissions_diff_df.to_dict(orient='records')
-        deployment_project_permissions_diff_df_yaml = deployment_project_permissions_diff_df.to_dict(orient='records')
-        deployment_environment_permissions_diff_df_yaml = deployment_environment_permissions_diff_df.to_dict(orient='records')
-        return global_permissions_diff_df_yaml, build_plan_permissions_diff_df_yaml, project_permissions_diff_df_yaml, deployment_permissions_diff_df_yaml, deployment_project_permissions_diff_df_yaml, deployment_environment_permissions_diff_df_yaml
+        return Categories._make({'added': added, 'removed': removed} for added, removed in permissions_diff_df)
 
     def write_permissions_diff_df_yaml(self, output_file):
         """
@@ -159,77 +265,172 @@ class BambooAccessReconciler:
         :return: Difference between the current permissions and the desired permissions in a dataframe and write to a YAML file
         """
         permissions_diff_df_yaml = self.get_permissions_diff_df_yaml()
-        global_permissions_diff_df_yaml = permissions_diff_df_yaml[0]
-        build_plan_permissions_diff_df_yaml = permissions_diff_df_yaml[1]
-        project_permissions_diff_df_yaml = permissions_diff_df_yaml[2]
-        deployment_permissions_diff_df_yaml = permissions_diff_df_yaml[3]
-        deployment_project_permissions_diff_df_yaml = permissions_diff_df_yaml[4]
-        deployment_environment_permissions_diff_df_yaml = permissions_diff_df_yaml[5]
-        with open(output_file, 'w') as outfile:
-            yaml.dump({'global_permissions_diff': global_permissions_diff_df_yaml, 'build_plan_permissions_diff': build_plan_permissions_diff_df_yaml, 'project_permissions_diff': project_permissions_diff_df_yaml, 'deployment_permissions_diff': deployment_permissions_diff_df_yaml, 'deployment_project_permissions_diff': deployment_project_permissions_diff_df_yaml, 'deployment_environment_permissions_diff': deployment_environment_permissions_diff_df_yaml}, outfile, default_flow_style=False)
-        return global_permissions_diff_df_yaml, build_plan_permissions_diff_df_yaml, project_permissions_diff_df_yaml, deployment_permissions_diff_df_yaml, deployment_project_permissions_diff_df_yaml, deployment_environment_permissions_diff_df_yaml
+        _dump_yaml(_to_records_dict(permissions_diff_df_yaml, '_diff'), output_file)
+        return permissions_diff_df_yaml
+
+    def compute_added_removed(self):
+        """
+        Get the permissions that need to be added and removed, without changing anything in Bamboo.
+        :return: Permissions that need to be added and permissions that need to be removed
+        """
+        permissions_diff_df = self.get_permissions_diff_df()
+        permissions_diff_df_added_yaml = Categories._make(added for added, removed in permissions_diff_df)
+        permissions_diff_df_removed_yaml = Categories._make(removed for added, removed in permissions_diff_df)
+        return permissions_diff_df_added_yaml, permissions_diff_df_removed_yaml
+
+    def apply_changes(self, permissions_diff_df_added_yaml, permissions_diff_df_removed_yaml):
+        """
+        Add and remove permissions in Bamboo.
+        :param permissions_diff_df_added_yaml: Permissions that need to be added
+        :param permissions_diff_df_removed_yaml: Permissions that need to be removed
+        :return: List of (callable, args) pairs of the REST calls that failed
+        """
+        added_calls = []
+        removed_calls = []
+        for category, keys, batch_handlers, added, removed in zip(PERMISSION_CATEGORIES, PERMISSION_KEYS, BATCH_HANDLERS, permissions_diff_df_added_yaml, permissions_diff_df_removed_yaml):
+            grant, revoke = (getattr(self, handler) for handler in batch_handlers) if batch_handlers else (None, None)
+            added_calls += self._batched_calls(grant, 'add_{}_permission'.format(category), added, keys)
+            removed_calls += self._batched_calls(revoke, 'remove_{}_permission'.format(category), removed, keys)
+        failed_calls = self._apply_calls(added_calls)
+        failed_calls += self._apply_calls(removed_calls)
+        self.invalidate()
+        return failed_calls
+
+    def invalidate(self):
+        """
+        Forget the cached current permissions and diff so the next call reads them from Bamboo again.
+        """
+        self._current_df = None
+        self._diff_df = None
 
     def update_permissions(self):
         """
         Update the permissions in Bamboo.
         :return: Updated permissions in Bamboo
+        :raises RuntimeError: If any of the REST calls failed
         """
-        permissions_diff_df = self.get_permissions_diff_df()
-        global_permissions_diff_df = permissions_diff_df[0]
-        build_plan_permissions_diff_df = permissions_diff_df[1]
-        project_permissions_diff_df = permissions_diff_df[2]
-        deployment_permissions_diff_df = permissions_diff_df[3]
-        deployment_project_permissions_diff_df = permissions_diff_df[4]
-        deployment_environment_permissions_diff_df = permissions_diff_df[5]
-        global_permissions_diff_df_added = global_permissions_diff_df[global_permissions_diff_df['_merge'] == 'right_only']
-        build_plan_permissions_diff_df_added = build_plan_permissions_diff_df[build_plan_permissions_diff_df['_merge'] == 'right_only']
-        project_permissions_diff_df_added = project_permissions_diff_df[project_permissions_diff_df['_merge'] == 'right_only']
-        deployment_permissions_diff_df_added = deployment_permissions_diff_df[deployment_permissions_diff_df['_merge'] == 'right_only']
-        deployment_project_permissions_diff_df_added = deployment_project_permissions_diff_df[deployment_project_permissions_diff_df['_merge'] == 'right_only']
-        deployment_environment_permissions_diff_df_added = deployment_environment_permissions_diff_df[deployment_environment_permissions_diff_df['_merge'] == 'right_only']
-        global_permissions_diff_df_removed = global_permissions_diff_df[global_permissions_diff_df['_merge'] == 'left_only']
-        build_plan_permissions_diff_df_removed = build_plan_permissions_diff_df[build_plan_permissions_diff_df['_merge'] == 'left_only']
-        project_permissions_diff_df_removed = project_permissions_diff_df[project_permissions_diff_df['_merge'] == 'left_only']
-        deployment_permissions_diff_df_removed = deployment_permissions_diff_df[deployment_permissions_diff_df['_merge'] == 'left_only']
-        deployment_project_permissions_diff_df_removed = deployment_project_permissions_diff_df[deployment_project_permissions_diff_df['_merge'] == 'left_only']
-        deployment_environment_permissions_diff_df_removed = deployment_environment_permissions_diff_df[deployment_environment_permissions_diff_df['_merge'] == 'left_only']
-        global_permissions_diff_df_added_yaml = global_permissions_diff_df_added.to_dict(orient='records')
-        build_plan_permissions_diff_df_added_yaml = build_plan_permissions_diff_df_added.to_dict(orient='records')
-        project_permissions_diff_df_added_yaml = project_permissions_diff_df_added.to_dict(orient='records')
-        deployment_permissions_diff_df_added_yaml = deployment_permissions_diff_df_added.to_dict(orient='records')
-        deployment_project_permissions_diff_df_added_yaml = deployment_project_permissions_diff_df_added.to_dict(orient='records')
-        deployment_environment_permissions_diff_df_added_yaml = deployment_environment_permissions_diff_df_added.to_dict(orient='records')
-        global_permissions_diff_df_removed_yaml = global_permissions_diff_df_removed.to_dict(orient='records')
-        build_plan_permissions_diff_df_removed_yaml = build_plan_permissions_diff_df_removed.to_dict(orient='records')
-        project_permissions_diff_df_removed_yaml = project_permissions_diff_df_removed.to_dict(orient='records')
-        deployment_permissions_diff_df_removed_yaml = deployment_permissions_diff_df_removed.to_dict(orient='records')
-        deployment_project_permissions_diff_df_removed_yaml = deployment_project_permissions_diff_df_removed.to_dict(orient='records')
-        deployment_environment_permissions_diff_df_removed_yaml = deployment_environment_permissions_diff_df_removed.to_dict(orient='records')
-        for global_permission_diff_df_added_yaml in global_permissions_diff_df_added_yaml:
-            self.bamboo_client.add_global_permission(global_permission_diff_df_added_yaml['permission'], global_permission_diff_df_added_yaml['type'], global_permission_diff_df_added_yaml['name'])
-        for build_plan_permission_diff_df_added_yaml in build_plan_permissions_diff_df_added_yaml:
-            self.bamboo_client.add_build_plan_permission(build_plan_permission_diff_df_added_yaml['permission'], build_plan_permission_diff_df_added_yaml['type'], build_plan_permission_diff_df_added_yaml['name'], build_plan_permission_diff_df_added_yaml['projectKey'], build_plan_permission_diff_df_added_yaml['planKey'])
-        for project_permission_diff_df_added_yaml in project_permissions_diff_df_added_yaml:
-            self.bamboo_client.add_project_permission(project_permission_diff_df_added_yaml['permission'], project_permission_diff_df_added_yaml['type'], project_permission_diff_df_added_yaml['name'], project_permission_diff_df_added_yaml['projectKey'])
-        for deployment_permission_diff_df_added_yaml in deployment_permissions_diff_df_added_yaml:
-            self.bamboo_client.add_deployment_permission(deployment_permission_diff_df_added_yaml['permission'], deployment_permission_diff_df_added_yaml['type'], deployment_permission_diff_df_added_yaml['name'])
-        for deployment_project_permission_diff_df_added_yaml in deployment_project_permissions_diff_df_added_yaml:
-            self.bamboo_client.add_deployment_project_permission(deployment_project_permission_diff_df_added_yaml['permission'], deployment_project_permission_diff_df_added_yaml['type'], deployment_project_permission_diff_df_added_yaml['name'], deployment_project_permission_diff_df_added_yaml['projectKey'])
-        for deployment_environment_permission_diff_df_added_yaml in deployment_environment_permissions_diff_df_added_yaml:
-            self.bamboo_client.add_deployment_environment_permission(deployment_environment_permission_diff_df_added_yaml['permission'], deployment_environment_permission_diff_df_added_yaml['type'], deployment_environment_permission_diff_df_added_yaml['name'], deployment_environment_permission_diff_df_added_yaml['projectKey'], deployment_environment_permission_diff_df_added_yaml['environmentId'])
-        for global_permission_diff_df_removed_yaml in global_permissions_diff_df_removed_yaml:
-            self.bamboo_client.remove_global_permission(global_permission_diff_df_removed_yaml['permission'], global_permission_diff_df_removed_yaml['type'], global_permission_diff_df_removed_yaml['name'])
-        for build_plan_permission_diff_df_removed_yaml in build_plan_permissions_diff_df_removed_yaml:
-            self.bamboo_client.remove_build_plan_permission(build_plan_permission_diff_df_removed_yaml['permission'], build_plan_permission_diff_df_removed_yaml['type'], build_plan_permission_diff_df_removed_yaml['name'], build_plan_permission_diff_df_removed_yaml['projectKey'], build_plan_permission_diff_df_removed_yaml['planKey'])
-        for project_permission_diff_df_removed_yaml in project_permissions_diff_df_removed_yaml:
-            self.bamboo_client.remove_project_permission(project_permission_diff_df_removed_yaml['permission'], project_permission_diff_df_removed_yaml['type'], project_permission_diff_df_removed_yaml['name'], project_permission_diff_df_removed_yaml['projectKey'])
-        for deployment_permission_diff_df_removed_yaml in deployment_permissions_diff_df_removed_yaml:
-            self.bamboo_client.remove_deployment_permission(deployment_permission_diff_df_removed_yaml['permission'], deployment_permission_diff_df_removed_yaml['type'], deployment_permission_diff_df_removed_yaml['name'])
-        for deployment_project_permission_diff_df_removed_yaml in deployment_project_permissions_diff_df_removed_yaml:
-            self.bamboo_client.remove_deployment_project_permission(deployment_project_permission_diff_df_removed_yaml['permission'], deployment_project_permission_diff_df_removed_yaml['type'], deployment_project_permission_diff_df_removed_yaml['name'], deployment_project_permission_diff_df_removed_yaml['projectKey'])
-        for deployment_environment_permission_diff_df_removed_yaml in deployment_environment_permissions_diff_df_removed_yaml:
-            self.bamboo_client.remove_deployment_environment_permission(deployment_environment_permission_diff_df_removed_yaml['permission'], deployment_environment_permission_diff_df_removed_yaml['type'], deployment_environment_permission_diff_df_removed_yaml['name'], deployment_environment_permission_diff_df_removed_yaml['projectKey'], deployment_environment_permission_diff_df_removed_yaml['environmentId'])
-        return global_permissions_diff_df_added_yaml, build_plan_permissions_diff_df_added_yaml, project_permissions_diff_df_added_yaml, deployment_permissions_diff_df_added_yaml, deployment_project_permissions_diff_df_added_yaml, deployment_environment_permissions_diff_df_added_yaml, global_permissions_diff_df_removed_yaml, build_plan_permissions_diff_df_removed_yaml, project_permissions_diff_df_removed_yaml, deployment_permissions_diff_df_removed_yaml, deployment_project_permissions_diff_df_removed_yaml, deployment_environment_permissions_diff_df_removed_yaml
+        permissions_diff_df_added_yaml, permissions_diff_df_removed_yaml = self.compute_added_removed()
+        failed_calls = self.apply_changes(permissions_diff_df_added_yaml, permissions_diff_df_removed_yaml)
+        if failed_calls:
+            raise RuntimeError("{} Bamboo permission update(s) failed, see the Bamboo log file".format(len(failed_calls)))
+        return permissions_diff_df_added_yaml + permissions_diff_df_removed_yaml
+
+    def _batched_calls(self, batch_function, row_function_name, records, keys):
+        """
+        Get the REST calls for the records of a category, one call per user or group and scope where the endpoint accepts a list of permissions.
+        :param batch_function: Function taking the other key columns and a list of permission names, None if the endpoint has no batch support
+        :param row_function_name: Name of the Bamboo client method taking the key columns of a single record, only looked up if a record needs it
+        :param records: Permission records
+        :param keys: Columns identifying a permission in this category
+        :return: List of (callable, args) pairs
+        """
+        if batch_function is None:
+            row_records = records
+            calls = []
+        else:
+            batched_records = [record for record in records if record['type'] in BATCH_TYPES]
+            row_records = [record for record in records if record['type'] not in BATCH_TYPES]
+            calls = [(batch_function, group + (permissions,)) for group, permissions in _group_permissions(batched_records, keys).items()]
+        if row_records:
+            row_function = getattr(self.bamboo_client, row_function_name)
+            calls += [(row_function, args) for args in _iter_cols(row_records, keys)]
+        return calls
+
+    def _grant_global_permissions(self, permission_type, name, permissions):
+        """
+        Grant global permissions to a user or group.
+        :param permission_type: 'user' or 'group'
+        :param name: User or group name
+        :param permissions: Permission names
+        """
+        resource = 'permissions/global/{}/{}'.format(BATCH_TYPES[permission_type], name)
+        return self.bamboo_client.put(self.bamboo_client.resource_url(resource), data=permissions)
+
+    def _revoke_global_permissions(self, permission_type, name, permissions):
+        """
+        Revoke global permissions from a user or group.
+        :param permission_type: 'user' or 'group'
+        :param name: User or group name
+        :param permissions: Permission names
+        """
+        resource = 'permissions/global/{}/{}'.format(BATCH_TYPES[permission_type], name)
+        return self.bamboo_client.delete(self.bamboo_client.resource_url(resource), data=permissions)
+
+    def _grant_deployment_project_permissions(self, permission_type, name, deployment_id, permissions):
+        """
+        Grant deployment project permissions to a user or group.
+        The projectKey of a deployment project permission record is the numeric deployment project id used by the permissions/deployment/{id} endpoint.
+        :param permission_type: 'user' or 'group'
+        :param name: User or group name
+        :param deployment_id: Deployment project id, the projectKey of the record
+        :param permissions: Permission names
+        """
+        if permission_type == 'group':
+            return self.bamboo_client.grant_group_to_deployment(deployment_id, name, permissions)
+        return self.bamboo_client.grant_user_to_deployment(deployment_id, name, permissions)
+
+    def _revoke_deployment_project_permissions(self, permission_type, name, deployment_id, permissions):
+        """
+        Revoke deployment project permissions from a user or group.
+        The projectKey of a deployment project permission record is the numeric deployment project id used by the permissions/deployment/{id} endpoint.
+        :param permission_type: 'user' or 'group'
+        :param name: User or group name
+        :param deployment_id: Deployment project id, the projectKey of the record
+        :param permissions: Permission names
+        """
+        if permission_type == 'group':
+            return self.bamboo_client.revoke_group_from_deployment(deployment_id, name, permissions)
+        return self.bamboo_client.revoke_user_from_deployment(deployment_id, name, permissions)
+
+    def _grant_deployment_environment_permissions(self, permission_type, name, deployment_id, environment_id, permissions):
+        """
+        Grant deployment environment permissions to a user or group.
+        :param permission_type: 'user' or 'group'
+        :param name: User or group name
+        :param deployment_id: Deployment project id, only part of the record key; environment ids are unique across deployment projects
+        :param environment_id: Deployment environment id
+        :param permissions: Permission names
+        """
+        if permission_type == 'group':
+            return self.bamboo_client.grant_group_to_environment(environment_id, name, permissions)
+        return self.bamboo_client.grant_user_to_environment(environment_id, name, permissions)
+
+    def _revoke_deployment_environment_permissions(self, permission_type, name, deployment_id, environment_id, permissions):
+        """
+        Revoke deployment environment permissions from a user or group.
+        :param permission_type: 'user' or 'group'
+        :param name: User or group name
+        :param deployment_id: Deployment project id, only part of the record key; environment ids are unique across deployment projects
+        :param environment_id: Deployment environment id
+        :param permissions: Permission names
+        """
+        if permission_type == 'group':
+            return self.bamboo_client.revoke_group_from_environment(environment_id, name, permissions)
+        return self.bamboo_client.revoke_user_from_environment(environment_id, name, permissions)
+
+    def _apply_calls(self, calls):
+        """
+        Run the Bamboo REST calls concurrently.
+        :param calls: List of (callable, args) pairs
+        :return: List of the (callable, args) pairs that failed
+        """
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            succeeded = list(executor.map(self._apply_call, calls))
+        return [call for call, ok in zip(calls, succeeded) if not ok]
+
+    def _apply_call(self, call):
+        """
+        Run a single Bamboo REST call, logging instead of raising on failure.
+        :param call: (callable, args) pair
+        :return: True if the call succeeded, False if it failed
+        """
+        function, args = call
+        try:
+            function(*args)
+        except Exception:
+            self.bamboo_client.logger.exception("%s%s failed", function.__name__, args)
+            return False
+        return True
 
     def write_permissions_diff_df_yaml_added(self, output_file):
         """
@@ -237,16 +438,9 @@ class BambooAccessReconciler:
         :param output_file: Output file
         :return: Permissions that need to be added to a YAML file
         """
-        permissions_diff_df_yaml_added = self.update_permissions()
-        global_permissions_diff_df_yaml_added = permissions_diff_df_yaml_added[0]
-        build_plan_permissions_diff_df_yaml_added = permissions_diff_df_yaml_added[1]
-        project_permissions_diff_df_yaml_added = permissions_diff_df_yaml_added[2]
-        deployment_permissions_diff_df_yaml_added = permissions_diff_df_yaml_added[3]
-        deployment_project_permissions_diff_df_yaml_added = permissions_diff_df_yaml_added[4]
-        deployment_environment_permissions_diff_df_yaml_added = permissions_diff_df_yaml_added[5]
-        with open(output_file, 'w') as outfile:
-            yaml.dump({'global_permissions_diff_added': global_permissions_diff_df_yaml_added, 'build_plan_permissions_diff_added': build_plan_permissions_diff_df_yaml_added, 'project_permissions_diff_added': project_permissions_diff_df_yaml_added, 'deployment_permissions_diff_added': deployment_permissions_diff_df_yaml_added, 'deployment_project_permissions_diff_added': deployment_project_permissions_diff_df_yaml_added, 'deployment_environment_permissions_diff_added': deployment_environment_permissions_diff_df_yaml_added}, outfile, default_flow_style=False)
-        return global_permissions_diff_df_yaml_added, build_plan_permissions_diff_df_yaml_added, project_permissions_diff_df_yaml_added, deployment_permissions_diff_df_yaml_added, deployment_project_permissions_diff_df_yaml_added, deployment_environment_permissions_diff_df_yaml_added
+        permissions_diff_df_yaml_added = self.compute_added_removed()[0]
+        _dump_yaml(_to_records_dict(permissions_diff_df_yaml_added, '_diff_added'), output_file)
+        return permissions_diff_df_yaml_added
 
     def write_permissions_diff_df_yaml_removed(self, output_file):
         """
@@ -254,16 +448,9 @@ class BambooAccessReconciler:
         :param output_file: Output file
         :return: Permissions that need to be removed to a YAML file
         """
-        permissions_diff_df_yaml_removed = self.update_permissions()
-        global_permissions_diff_df_yaml_removed = permissions_diff_df_yaml_removed[6]
-        build_plan_permissions_diff_df_yaml_removed = permissions_diff_df_yaml_removed[7]
-        project_permissions_diff_df_yaml_removed = permissions_diff_df_yaml_removed[8]
-        deployment_permissions_diff_df_yaml_removed = permissions_diff_df_yaml_removed[9]
-        deployment_project_permissions_diff_df_yaml_removed = permissions_diff_df_yaml_removed[10]
-        deployment_environment_permissions_diff_df_yaml_removed = permissions_diff_df_yaml_removed[11]
-        with open(output_file, 'w') as outfile:
-            yaml.dump({'global_permissions_diff_removed': global_permissions_diff_df_yaml_removed, 'build_plan_permissions_diff_removed': build_plan_permissions_diff_df_yaml_removed, 'project_permissions_diff_removed': project_permissions_diff_df_yaml_removed, 'deployment_permissions_diff_removed': deployment_permissions_diff_df_yaml_removed, 'deployment_project_permissions_diff_removed': deployment_project_permissions_diff_df_yaml_removed, 'deployment_environment_permissions_diff_removed': deployment_environment_permissions_diff_df_yaml_removed}, outfile, default_flow_style=False)
-        return global_permissions_diff_df_yaml_removed, build_plan_permissions_diff_df_yaml_removed, project_permissions_diff_df_yaml_removed, deployment_permissions_diff_df_yaml_removed, deployment_project_permissions_diff_df_yaml_removed, deployment_environment_permissions_diff_df_yaml_removed
+        permissions_diff_df_yaml_removed = self.compute_added_removed()[1]
+        _dump_yaml(_to_records_dict(permissions_diff_df_yaml_removed, '_diff_removed'), output_file)
+        return permissions_diff_df_yaml_removed
 
 
 if __name__ == '__main__':
@@ -277,160 +464,271 @@ if __name__ == '__main__':
     args = parser.parse_args()
     bamboo_access_reconciler = BambooAccessReconciler(args.bamboo_url, args.bamboo_user, args.bamboo_password, args.bamboo_log_file, args.bamboo_log_level, args.desired_permissions_file)
     bamboo_access_reconciler.write_permissions_diff_df_yaml('permissions_diff.yaml')
-    bamboo_access_reconciler.write_permissions_diff_df_yaml_added('permissions_diff_added.yaml')
-    bamboo_access_reconciler.write_permissions_diff_df_yaml_removed('permissions_diff_removed.yaml')
+    permissions_diff_df_yaml_added = bamboo_access_reconciler.write_permissions_diff_df_yaml_added('permissions_diff_added.yaml')
+    permissions_diff_df_yaml_removed = bamboo_access_reconciler.write_permissions_diff_df_yaml_removed('permissions_diff_removed.yaml')
+    failed_calls = bamboo_access_reconciler.apply_changes(permissions_diff_df_yaml_added, permissions_diff_df_yaml_removed)
+    if failed_calls:
+        sys.exit("{} Bamboo permission update(s) failed, see {}".format(len(failed_calls), args.bamboo_log_file))
 
 """
 The desired permissions file is a YAML file that contains the desired permissions for the Bamboo instance. The desired permissions file is structured as follows:
 
+Each section is a list of permission records. Every record has the key columns of its section, see PERMISSION_KEYS.
+
 global_permissions:
-  - name: <user or group name>
-    permissions:
-      - <permission name>
-  - name: <user or group name>
-    permissions:
-      - <permission name>
+  - permission: <permission name>
+    type: <user or group>
+    name: <user or group name>
 build_plan_permissions:
-  - name: <build plan name>
-    permissions:
-      - name: <user or group name>
-        permissions:
-          - <permission name>
-      - name: <user or group name>
-        permissions:
-          - <permission name>
+  - permission: <permission name>
+    type: <user or group>
+    name: <user or group name>
+    projectKey: <project key>
+    planKey: <plan key>
 project_permissions:
-  - name: <project name>
-    permissions:
-      - name: <user or group name>
-        permissions:
-          - <permission name>
-      - name: <user or group name>
-        permissions:
-          - <permission name>
+  - permission: <permission name>
+    type: <user or group>
+    name: <user or group name>
+    projectKey: <project key>
 deployment_permissions:
-  - name: <deployment name>
-    permissions:
-      - name: <user or group name>
-        permissions:
-          - <permission name>
-      - name: <user or group name>
-        permissions:
-          - <permission name>
+  - permission: <permission name>
+    type: <user or group>
+    name: <user or group name>
 deployment_project_permissions:
-  - name: <deployment project name>
-    permissions:
-      - name: <user or group name>
-        permissions:
-          - <permission name>
-      - name: <user or group name>
-        permissions:
-          - <permission name>
+  - permission: <permission name>
+    type: <user or group>
+    name: <user or group name>
+    projectKey: <deployment project id>
 deployment_environment_permissions:
-  - name: <deployment environment name>
-    permissions:
-      - name: <user or group name>
-        permissions:
-          - <permission name>
-      - name: <user or group name>
-        permissions:
-          - <permission name>
+  - permission: <permission name>
+    type: <user or group>
+    name: <user or group name>
+    projectKey: <deployment project id>
+    environmentId: <deployment environment id>
 
 The following is an example of a desired permissions file:
 
 global_permissions:
-  - name: admin
-    permissions:
-      - ADMINISTER
-      - BUILD
-      - CLONE
-      - EDIT
-      - VIEW
-  - name: jdoe
-    permissions:
-      - BUILD
-      - CLONE
-      - EDIT
-      - VIEW
+  - permission: ADMINISTER
+    type: user
+    name: admin
+  - permission: BUILD
+    type: user
+    name: admin
+  - permission: CLONE
+    type: user
+    name: admin
+  - permission: EDIT
+    type: user
+    name: admin
+  - permission: VIEW
+    type: user
+    name: admin
+  - permission: BUILD
+    type: user
+    name: jdoe
+  - permission: CLONE
+    type: user
+    name: jdoe
+  - permission: EDIT
+    type: user
+    name: jdoe
+  - permission: VIEW
+    type: user
+    name: jdoe
 build_plan_permissions:
-  - name: BUILD-PLAN-1
-    permissions:
-      - name: admin
-        permissions:
-          - ADMINISTER
-          - BUILD
-          - CLONE
-          - EDIT
-          - VIEW
-      - name: jdoe
-        permissions:
-          - BUILD
-          - CLONE
-          - EDIT
-          - VIEW
+  - permission: ADMINISTER
+    type: user
+    name: admin
+    projectKey: PROJECT-1
+    planKey: PROJECT-1-PLAN-1
+  - permission: BUILD
+    type: user
+    name: admin
+    projectKey: PROJECT-1
+    planKey: PROJECT-1-PLAN-1
+  - permission: CLONE
+    type: user
+    name: admin
+    projectKey: PROJECT-1
+    planKey: PROJECT-1-PLAN-1
+  - permission: EDIT
+    type: user
+    name: admin
+    projectKey: PROJECT-1
+    planKey: PROJECT-1-PLAN-1
+  - permission: VIEW
+    type: user
+    name: admin
+    projectKey: PROJECT-1
+    planKey: PROJECT-1-PLAN-1
+  - permission: BUILD
+    type: user
+    name: jdoe
+    projectKey: PROJECT-1
+    planKey: PROJECT-1-PLAN-1
+  - permission: CLONE
+    type: user
+    name: jdoe
+    projectKey: PROJECT-1
+    planKey: PROJECT-1-PLAN-1
+  - permission: EDIT
+    type: user
+    name: jdoe
+    projectKey: PROJECT-1
+    planKey: PROJECT-1-PLAN-1
+  - permission: VIEW
+    type: user
+    name: jdoe
+    projectKey: PROJECT-1
+    planKey: PROJECT-1-PLAN-1
 project_permissions:
-  - name: PROJECT-1
-    permissions:
-      - name: admin
-        permissions:
-          - ADMINISTER
-          - BUILD
-          - CLONE
-          - EDIT
-          - VIEW
-      - name: jdoe
-        permissions:
-          - BUILD
-          - CLONE
-          - EDIT
-          - VIEW
+  - permission: ADMINISTER
+    type: user
+    name: admin
+    projectKey: PROJECT-1
+  - permission: BUILD
+    type: user
+    name: admin
+    projectKey: PROJECT-1
+  - permission: CLONE
+    type: user
+    name: admin
+    projectKey: PROJECT-1
+  - permission: EDIT
+    type: user
+    name: admin
+    projectKey: PROJECT-1
+  - permission: VIEW
+    type: user
+    name: admin
+    projectKey: PROJECT-1
+  - permission: BUILD
+    type: user
+    name: jdoe
+    projectKey: PROJECT-1
+  - permission: CLONE
+    type: user
+    name: jdoe
+    projectKey: PROJECT-1
+  - permission: EDIT
+    type: user
+    name: jdoe
+    projectKey: PROJECT-1
+  - permission: VIEW
+    type: user
+    name: jdoe
+    projectKey: PROJECT-1
 deployment_permissions:
-  - name: DEPLOYMENT-1
-    permissions:
-      - name: admin
-        permissions:
-          - ADMINISTER
-          - BUILD
-          - CLONE
-          - EDIT
-          - VIEW
-      - name: jdoe
-        permissions:
-          - BUILD
-          - CLONE
-          - EDIT
-          - VIEW
+  - permission: ADMINISTER
+    type: user
+    name: admin
+  - permission: BUILD
+    type: user
+    name: admin
+  - permission: CLONE
+    type: user
+    name: admin
+  - permission: EDIT
+    type: user
+    name: admin
+  - permission: VIEW
+    type: user
+    name: admin
+  - permission: BUILD
+    type: user
+    name: jdoe
+  - permission: CLONE
+    type: user
+    name: jdoe
+  - permission: EDIT
+    type: user
+    name: jdoe
+  - permission: VIEW
+    type: user
+    name: jdoe
 deployment_project_permissions:
-  - name: DEPLOYMENT-PROJECT-1
-    permissions:
-      - name: admin
-        permissions:
-          - ADMINISTER
-          - BUILD
-          - CLONE
-          - EDIT
-          - VIEW
-      - name: jdoe
-        permissions:
-          - BUILD
-          - CLONE
-          - EDIT
-          - VIEW
+  - permission: ADMINISTER
+    type: user
+    name: admin
+    projectKey: 1015809
+  - permission: BUILD
+    type: user
+    name: admin
+    projectKey: 1015809
+  - permission: CLONE
+    type: user
+    name: admin
+    projectKey: 1015809
+  - permission: EDIT
+    type: user
+    name: admin
+    projectKey: 1015809
+  - permission: VIEW
+    type: user
+    name: admin
+    projectKey: 1015809
+  - permission: BUILD
+    type: user
+    name: jdoe
+    projectKey: 1015809
+  - permission: CLONE
+    type: user
+    name: jdoe
+    projectKey: 1015809
+  - permission: EDIT
+    type: user
+    name: jdoe
+    projectKey: 1015809
+  - permission: VIEW
+    type: user
+    name: jdoe
+    projectKey: 1015809
 deployment_environment_permissions:
-  - name: DEPLOYMENT-ENVIRONMENT-1
-    permissions:
-      - name: admin
-        permissions:
-          - ADMINISTER
-          - BUILD
-          - CLONE
-          - EDIT
-          - VIEW
-      - name: jdoe
-        permissions:
-          - BUILD
-          - CLONE
-          - EDIT
-          - VIEW
+  - permission: ADMINISTER
+    type: user
+    name: admin
+    projectKey: 1015809
+    environmentId: 1114113
+  - permission: BUILD
+    type: user
+    name: admin
+    projectKey: 1015809
+    environmentId: 1114113
+  - permission: CLONE
+    type: user
+    name: admin
+    projectKey: 1015809
+    environmentId: 1114113
+  - permission: EDIT
+    type: user
+    name: admin
+    projectKey: 1015809
+    environmentId: 1114113
+  - permission: VIEW
+    type: user
+    name: admin
+    projectKey: 1015809
+    environmentId: 1114113
+  - permission: BUILD
+    type: user
+    name: jdoe
+    projectKey: 1015809
+    environmentId: 1114113
+  - permission: CLONE
+    type: user
+    name: jdoe
+    projectKey: 1015809
+    environmentId: 1114113
+  - permission: EDIT
+    type: user
+    name: jdoe
+    projectKey: 1015809
+    environmentId: 1114113
+  - permission: VIEW
+    type: user
+    name: jdoe
+    projectKey: 1015809
+    environmentId: 1114113
 
 """
\ No newline at end of file
@@ -1,89 +1,46 @@
+import logging
 import unittest
 
-from bamboo_access_reconciler import BambooAccessReconciler
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from bamboo_access_reconciler import BambooAccessReconciler, Categories, GLOBAL_KEYS, DEPLOYMENT_ENVIRONMENT_KEYS, _row_diff
+
+EXPECTED_GLOBAL_PERMISSIONS_DF = pd.DataFrame({'user': ['admin', 'admin'], 'group': [None, None], 'permission': ['ADMINISTER', 'ADMINISTER'], 'value': [True, True]})
+EXPECTED_BUILD_PLAN_PERMISSIONS_DF = pd.DataFrame({'user': ['admin', 'admin'], 'group': [None, None], 'permission': ['BUILD', 'BUILD'], 'value': [True, True]})
+EXPECTED_PROJECT_PERMISSIONS_DF = pd.DataFrame({'user': ['admin', 'admin'], 'group': [None, None], 'permission': ['ADMINISTER', 'ADMINISTER'], 'value': [True, True]})
+EXPECTED_REPOSITORY_PERMISSIONS_DF = pd.DataFrame({'user': ['admin', 'admin'], 'group': [None, None], 'permission': ['ADMINISTER', 'ADMINISTER'], 'value': [True, True]})
+EXPECTED_GROUPS_GLOBAL_PERMISSIONS_DF = pd.DataFrame({'user': ['admin', 'admin', None], 'group': [None, None, 'group1'], 'permission': ['ADMINISTER', 'ADMINISTER', 'ADMINISTER'], 'value': [True, True, True]})
+EXPECTED_GROUPS_BUILD_PLAN_PERMISSIONS_DF = pd.DataFrame({'user': ['admin', 'admin', None], 'group': [None, None, 'group1'], 'permission': ['ADMINISTER', 'ADMINISTER', 'BUILD'], 'value': [True, True, True]})
 
 class TestBambooAccessReconciler(unittest.TestCase):
-    def setUp(self):
-        self.bamboo_access_reconciler = BambooAccessReconciler()
-        self.bamboo_access_reconciler.read_all_permissions_df_yaml('permissions.yaml')
+    @classmethod
+    def setUpClass(cls):
+        cls.bamboo_access_reconciler = BambooAccessReconciler()
+        cls.bamboo_access_reconciler.read_all_permissions_df_yaml('permissions.yaml')
 
     def test_get_global_permissions_df(self):
         global_permissions_df = self.bamboo_access_reconciler.get_global_permissions_df()
-        self.assertIsNotNone(global_permissions_df)
-        self.assertEqual(len(global_permissions_df.index), 2)
-        self.assertEqual(len(global_permissions_df.columns), 4)
-        self.assertEqual(global_permissions_df.columns[0], 'user')
-        self.assertEqual(global_permissions_df.columns[1], 'group')
-        self.assertEqual(global_permissions_df.columns[2], 'permission')
-        self.assertEqual(global_permissions_df.columns[3], 'value')
-        self.assertEqual(global_permissions_df['user'][0], 'admin')
-        self.assertEqual(global_permissions_df['group'][0], None)
-        self.assertEqual(global_permissions_df['permission'][0], 'ADMINISTER')
-        self.assertEqual(global_permissions_df['value'][0], True)
-        self.assertEqual(global_permissions_df['user'][1], 'admin')
-        self.assertEqual(global_permissions_df['group'][1], None)
-        self.assertEqual(global_permissions_df['permission'][1], 'ADMINISTER')
-        self.assertEqual(global_permissions_df['value'][1], True)
+        assert_frame_equal(global_permissions_df, EXPECTED_GLOBAL_PERMISSIONS_DF, check_dtype=False)
 
     def test_get_build_plan_permissions_df(self):
         build_plan_permissions_df = self.bamboo_access_reconciler.get_build_plan_permissions_df()
-        self.assertIsNotNone(build_plan_permissions_df)
-        self.assertEqual(len(build_plan_permissions_df.index), 2)
-        self.assertEqual(len(build_plan_permissions_df.columns), 4)
-        self.assertEqual(build_plan_permissions_df.columns[0], 'user')
-        self.assertEqual(build_plan_permissions_df.columns[1], 'group')
-        self.assertEqual(build_plan_permissions_df.columns[2], 'permission')
-        self.assertEqual(build_plan_permissions_df.columns[3], 'value')
-        self.assertEqual(build_plan_permissions_df['user'][0], 'admin')
-        self.assertEqual(build_plan_permissions_df['group'][0], None)
-        self.assertEqual(build_plan_permissions_df['permission'][0], 'BUILD')
-        self.assertEqual(build_plan_permissions_df['value'][0], True)
-        self.assertEqual(build_plan_permissions_df['user'][1], 'admin')
-        self.assertEqual(build_plan_permissions_df['group'][1], None)
-        self.assertEqual(build_plan_permissions_df['permission'][1], 'BUILD')
-        self.assertEqual(build_plan_permissions_df['value'][1], True)
+        assert_frame_equal(build_plan_permissions_df, EXPECTED_BUILD_PLAN_PERMISSIONS_DF, check_dtype=False)
 
     def test_get_project_permissions_df(self):
         project_permissions_df = self.bamboo_access_reconciler.get_project_permissions_df()
-        self.assertIsNotNone(project_permissions_df)
-        self.assertEqual(len(project_permissions_df.index), 2)
-        self.assertEqual(len(project_permissions_df.columns), 4)
-        self.assertEqual(project_permissions_df.columns[0], 'user')
-        self.assertEqual(project_permissions_df.columns[1], 'group')
-        self.assertEqual(project_permissions_df.columns[2], 'permission')
-        self.assertEqual(project_permissions_df.columns[3], 'value')
-        self.assertEqual(project_permissions_df['user'][0], 'admin')
-        self.assertEqual(project_permissions_df['group'][0], None)
-        self.assertEqual(project_permissions_df['permission'][0], 'ADMINISTER')
-        self.assertEqual(project_permissions_df['value'][0], True)
-        self.assertEqual(project_permissions_df['user'][1], 'admin')
-        self.assertEqual(project_permissions_df['group'][1], None)
-        self.assertEqual(project_permissions_df['permission'][1], 'ADMINISTER')
-        self.assertEqual(project_permissions_df['value'][1], True)
+        assert_frame_equal(project_permissions_df, EXPECTED_PROJECT_PERMISSIONS_DF, check_dtype=False)
 
     def test_get_repository_permissions_df(self):
         repository_permissions_df = self.bamboo_access_reconciler.get_repository_permissions_df()
-        self.assertIsNotNone(repository_permissions_df)
-        self.assertEqual(len(repository_permissions_df.index), 2)
-        self.assertEqual(len(repository_permissions_df.columns), 4)
-        self.assertEqual(repository_permissions_df.columns[0], 'user')
-        self.assertEqual(repository_permissions_df.columns[1], 'group')
-        self.assertEqual(repository_permissions_df.columns[2], 'permission')
-        self.assertEqual(repository_permissions_df.columns[3], 'value')
-        self.assertEqual(repository_permissions_df['user'][0], 'admin')
-        self.assertEqual(repository_permissions_df['group'][0], None)
-        self.assertEqual(repository_permissions_df['permission'][0], 'ADMINISTER')
-        self.assertEqual(repository_permissions_df['value'][0], True)
-        self.assertEqual(repository_permissions_df['user'][1], 'admin')
-        self.assertEqual(repository_permissions_df['group'][1], None)
-        self.assertEqual(repository_permissions_df['permission'][1], 'ADMINISTER')
-        self.assertEqual(repository_permissions_df['value'][1], True)
-
-
-class TestBambooAccessReconcilerWithGroups(BaseTestBambooAccessReconciler):
+        assert_frame_equal(repository_permissions_df, EXPECTED_REPOSITORY_PERMISSIONS_DF, check_dtype=False)
+
+
+class TestBambooAccessReconcilerWithGroups(unittest.TestCase):
   
-      def setUp(self):
-          self.bamboo_access_reconciler = BambooAccessReconciler(
+      @classmethod
+      def setUpClass(cls):
+          cls.bamboo_access_reconciler = BambooAccessReconciler(
               bamboo_url='http://localhost:8085',
               bamboo_user='admin',
               bamboo_password='admin',
@@ -107,44 +64,114 @@ class TestBambooAccessReconcilerWithGroups(BaseTestBambooAccessReconciler):
   
       def test_get_global_permissions_df(self):
           global_permissions_df = self.bamboo_access_reconciler.get_global_permissions_df()
-          self.assertIsNotNone(global_permissions_df)
-          self.assertEqual(len(global_permissions_df.index), 3)
-          self.assertEqual(len(global_permissions_df.columns), 4)
-          self.assertEqual(global_permissions_df.columns[0], 'user')
-          self.assertEqual(global_permissions_df.columns[1], 'group')
-          self.assertEqual(global_permissions_df.columns[2], 'permission')
-          self.assertEqual(global_permissions_df.columns[3], 'value')
-          self.assertEqual(global_permissions_df['user'][0], 'admin')
-          self.assertEqual(global_permissions_df['group'][0], None)
-          self.assertEqual(global_permissions_df['permission'][0], 'ADMINISTER')
-          self.assertEqual(global_permissions_df['value'][0], True)
-          self.assertEqual(global_permissions_df['user'][1], 'admin')
-          self.assertEqual(global_permissions_df['group'][1], None)
-          self.assertEqual(global_permissions_df['permission'][1], 'ADMINISTER')
-          self.assertEqual(global_permissions_df['value'][1], True)
-          self.assertEqual(global_permissions_df['user'][2], None)
-          self.assertEqual(global_permissions_df['group'][2], 'group1')
-          self.assertEqual(global_permissions_df['permission'][2], 'ADMINISTER')
-          self.assertEqual(global_permissions_df['value'][2], True)
+          assert_frame_equal(global_permissions_df, EXPECTED_GROUPS_GLOBAL_PERMISSIONS_DF, check_dtype=False)
   
       def test_get_build_plan_permissions_df(self):
           build_plan_permissions_df = self.bamboo_access_reconciler.get_build_plan_permissions_df()
-          self.assertIsNotNone(build_plan_permissions_df)
-          self.assertEqual(len(build_plan_permissions_df.index), 3)
-          self.assertEqual(len(build_plan_permissions_df.columns), 4)
-          self.assertEqual(build_plan_permissions_df.columns[0], 'user')
-          self.assertEqual(build_plan_permissions_df.columns[1], 'group')
-          self.assertEqual(build_plan_permissions_df.columns[2], 'permission')
-          self.assertEqual(build_plan_permissions_df.columns[3], 'value')
-          self.assertEqual(build_plan_permissions_df['user'][0], 'admin')
-          self.assertEqual(build_plan_permissions_df['group'][0], None)
-          self.assertEqual(build_plan_permissions_df['permission'][0], 'ADMINISTER')
-          self.assertEqual(build_plan_permissions_df['value'][0], True)
-          self.assertEqual(build_plan_permissions_df['user'][1], 'admin')
-          self.assertEqual(build_plan_permissions_df['group'][1], None)
-          self.assertEqual(build_plan_permissions_df['permission'][1], 'ADMINISTER')
-          self.assertEqual(build_plan_permissions_df['value'][1], True)
-          self.assertEqual(build_plan_permissions_df['user'][2], None)
-          self.assertEqual(build_plan_permissions_df['group'][2], 'group1')
-          self.assertEqual(build_plan_permissions_df['permission'][2], 'BUILD')
-          self.assertEqual(build_plan_permissions_df['value'][2], True)
\ No newline at end of file
+          assert_frame_equal(build_plan_permissions_df, EXPECTED_GROUPS_BUILD_PLAN_PERMISSIONS_DF, check_dtype=False)
+
+
+class TestRowDiff(unittest.TestCase):
+
+    def test_added_and_removed(self):
+        current = [('ADMINISTER', 'user', 'admin'), ('VIEW', 'user', 'jdoe')]
+        desired = [{'permission': 'ADMINISTER', 'type': 'user', 'name': 'admin'}, {'permission': 'BUILD', 'type': 'group', 'name': 'developers'}]
+        added, removed = _row_diff(current, desired, GLOBAL_KEYS)
+        self.assertEqual(added, [{'permission': 'BUILD', 'type': 'group', 'name': 'developers'}])
+        self.assertEqual(removed, [{'permission': 'VIEW', 'type': 'user', 'name': 'jdoe'}])
+
+    def test_duplicates_are_reported_once(self):
+        current = [('VIEW', 'user', 'jdoe'), ('VIEW', 'user', 'jdoe')]
+        desired = [{'permission': 'BUILD', 'type': 'user', 'name': 'jdoe'}, {'permission': 'BUILD', 'type': 'user', 'name': 'jdoe'}]
+        added, removed = _row_diff(current, desired, GLOBAL_KEYS)
+        self.assertEqual(added, [{'permission': 'BUILD', 'type': 'user', 'name': 'jdoe'}])
+        self.assertEqual(removed, [{'permission': 'VIEW', 'type': 'user', 'name': 'jdoe'}])
+
+    def test_none_keys_match(self):
+        current = [('DEPLOY', 'user', 'jdoe', None, 5), ('DEPLOY', 'user', 'admin', 'PROJECT-1', None)]
+        desired = [{'permission': 'DEPLOY', 'type': 'user', 'name': 'jdoe', 'projectKey': None, 'environmentId': 5}, {'permission': 'DEPLOY', 'type': 'user', 'name': 'admin', 'projectKey': 'PROJECT-1', 'environmentId': 6}]
+        added, removed = _row_diff(current, desired, DEPLOYMENT_ENVIRONMENT_KEYS)
+        self.assertEqual(added, [{'permission': 'DEPLOY', 'type': 'user', 'name': 'admin', 'projectKey': 'PROJECT-1', 'environmentId': 6}])
+        self.assertEqual(removed, [{'permission': 'DEPLOY', 'type': 'user', 'name': 'admin', 'projectKey': 'PROJECT-1', 'environmentId': None}])
+
+    def test_converged(self):
+        current = [('VIEW', 'user', 'jdoe'), ('ADMINISTER', 'user', 'admin')]
+        desired = [{'permission': 'ADMINISTER', 'type': 'user', 'name': 'admin'}, {'permission': 'VIEW', 'type': 'user', 'name': 'jdoe'}]
+        self.assertEqual(_row_diff(current, desired, GLOBAL_KEYS), ([], []))
+        self.assertEqual(_row_diff([], [], GLOBAL_KEYS), ([], []))
+
+
+class FakeBambooClient:
+    """
+    Bamboo client recording the REST calls made by the reconciler.
+    """
+    def __init__(self, failing=()):
+        self.calls = []
+        self.failing = failing
+        self.logger = logging.getLogger(__name__)
+
+    def resource_url(self, resource):
+        return 'rest/api/latest/' + resource
+
+    def put(self, url, data=None):
+        self.calls.append(('put', url, data))
+
+    def delete(self, url, data=None):
+        self.calls.append(('delete', url, data))
+
+    def __getattr__(self, name):
+        if not name.startswith(('grant_', 'revoke_', 'add_', 'remove_')):
+            raise AttributeError(name)
+
+        def method(*args):
+            if name in self.failing:
+                raise RuntimeError(name)
+            self.calls.append((name,) + args)
+        method.__name__ = name
+        return method
+
+
+class TestApplyChanges(unittest.TestCase):
+
+    def setUp(self):
+        self.client = FakeBambooClient()
+        self.bamboo_access_reconciler = BambooAccessReconciler.from_client(self.client)
+        self.nothing = Categories([], [], [], [], [], [])
+
+    def test_global_permissions_of_a_user_are_batched(self):
+        added = self.nothing._replace(global_=[{'permission': 'ADMINISTER', 'type': 'user', 'name': 'admin'}, {'permission': 'BUILD', 'type': 'user', 'name': 'admin'}])
+        failed_calls = self.bamboo_access_reconciler.apply_changes(added, self.nothing)
+        self.assertEqual(failed_calls, [])
+        self.assertEqual(self.client.calls, [('put', 'rest/api/latest/permissions/global/users/admin', ['ADMINISTER', 'BUILD'])])
+
+    def test_global_permissions_are_revoked_per_group(self):
+        removed = self.nothing._replace(global_=[{'permission': 'VIEW', 'type': 'group', 'name': 'developers'}, {'permission': 'VIEW', 'type': 'user', 'name': 'jdoe'}])
+        self.bamboo_access_reconciler.apply_changes(self.nothing, removed)
+        self.assertCountEqual(self.client.calls, [('delete', 'rest/api/latest/permissions/global/groups/developers', ['VIEW']), ('delete', 'rest/api/latest/permissions/global/users/jdoe', ['VIEW'])])
+
+    def test_unknown_type_falls_back_to_a_per_record_call(self):
+        added = self.nothing._replace(global_=[{'permission': 'VIEW', 'type': 'anonymous', 'name': None}])
+        self.bamboo_access_reconciler.apply_changes(added, self.nothing)
+        self.assertEqual(self.client.calls, [('add_global_permission', 'VIEW', 'anonymous', None)])
+
+    def test_deployment_environment_permissions_use_the_environment_id(self):
+        added = self.nothing._replace(deployment_environment=[{'permission': 'DEPLOY', 'type': 'user', 'name': 'jdoe', 'projectKey': 1015809, 'environmentId': 5}, {'permission': 'VIEW', 'type': 'user', 'name': 'jdoe', 'projectKey': 1015809, 'environmentId': 5}])
+        self.bamboo_access_reconciler.apply_changes(added, self.nothing)
+        self.assertEqual(self.client.calls, [('grant_user_to_environment', 5, 'jdoe', ['DEPLOY', 'VIEW'])])
+
+    def test_deployment_project_permissions_use_the_project_key_as_deployment_id(self):
+        removed = self.nothing._replace(deployment_project=[{'permission': 'EDIT', 'type': 'group', 'name': 'developers', 'projectKey': 1015809}])
+        self.bamboo_access_reconciler.apply_changes(self.nothing, removed)
+        self.assertEqual(self.client.calls, [('revoke_group_from_deployment', 1015809, 'developers', ['EDIT'])])
+
+    def test_empty_diff_makes_no_calls(self):
+        self.bamboo_access_reconciler = BambooAccessReconciler.from_client(object())
+        self.assertEqual(self.bamboo_access_reconciler.apply_changes(self.nothing, self.nothing), [])
+
+    def test_failed_calls_are_returned(self):
+        self.client.failing = ('grant_group_to_environment',)
+        added = self.nothing._replace(deployment_environment=[{'permission': 'DEPLOY', 'type': 'group', 'name': 'developers', 'projectKey': 1015809, 'environmentId': 5}])
+        with self.assertLogs(self.client.logger, level='ERROR') as logs:
+            failed_calls = self.bamboo_access_reconciler.apply_changes(added, self.nothing)
+        self.assertEqual([args for function, args in failed_calls], [('group', 'developers', 1015809, 5, ['DEPLOY'])])
+        self.assertIn('grant_group_to_environment', logs.output[0])
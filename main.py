@@ -1,4 +1,3 @@
-from atlassian import Bamboo as bamboo
 from bamboo_access import BambooAccess
 
 if __name__ == '__main__':